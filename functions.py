@@ -3,7 +3,24 @@ import os
 import zipfile
 from PIL import Image
 import io
-from rembg import remove
+import hashlib
+import json
+import multiprocessing
+import queue
+import time
+from rembg import remove, new_session
+
+THUMBNAIL_DIR = 'thumbnail_cache'  # On-disk cache of gallery thumbnails
+THUMBNAIL_SIZE = (128, 128)  # Fixed thumbnail size used by the results gallery
+THUMBNAIL_CACHE_LIMIT = 20000  # Maximum number of thumbnails kept on disk
+
+IMAGE_TIMEOUT = 120  # Seconds an isolated worker may spend on one image before it is killed
+WORKER_START_TIMEOUT = 1800  # Seconds a new worker may take to load the model (downloaded on first use)
+WORKER_START_FAILURES = 5  # Consecutive worker start failures after which an isolated run is aborted
+IMAGE_RETRIES = 2  # Extra attempts for an image that failed, timed out or crashed its worker
+RETRY_MAX_SIDE = 1024  # Retries after the first use a copy downscaled to this size (None always retries the original image)
+WORKER_RECYCLE_AFTER = 50  # Images processed before an isolated worker is replaced, to cap memory growth
+FAILURE_REPORT_NAME = 'failures.json'  # Report written to the output folder by isolated runs
 
 # Function to create an output folder based on the ZIP file name
 def create_output_folder(zip_file_path, output_dir):
@@ -13,7 +30,17 @@ def create_output_folder(zip_file_path, output_dir):
     return output_folder  # Returns the path to the created folder
 
 # Main function to process images from a ZIP file
-def process_images(zip_file_path, output_dir, update_status_callback, running_flag):
+# With isolated=True every image runs in a worker process that is killed on timeout or crash
+def process_images(zip_file_path, output_dir, update_status_callback, running_flag, result_callback=None,
+                   isolated=False, timeout=IMAGE_TIMEOUT, retries=IMAGE_RETRIES, retry_max_side=RETRY_MAX_SIDE,
+                   recycle_after=WORKER_RECYCLE_AFTER):
+    worker = IsolatedWorker(recycle_after) if isolated else None
+    failures = []
+    retried = []  # Images saved only after failed attempts, possibly from a downscaled copy
+    output_folder = None
+    images = []
+    processed = 0  # Images that were attempted to the end (saved or failed)
+    error = None  # Reason the run was aborted, if it was
     try:
         # Step 1: Create the output folder
         output_folder = create_output_folder(zip_file_path, output_dir)
@@ -31,36 +58,244 @@ def process_images(zip_file_path, output_dir, update_status_callback, running_fl
                 update_status_callback("Process stopped.")  # Updates the status to 'stopped'
                 break  # Exits the loop if the process is stopped
             update_status_callback(f"Processing {image_name}...")  # Updates status for each image being processed
-            process_single_image(image_name, output_folder)  # Processes the individual image
+            if worker:
+                image_path = os.path.join('temp_images', image_name)
+                output_image_path, report_entry = worker.process_image(image_path, output_folder, running_flag, timeout, retries, retry_max_side)
+                if not running_flag():
+                    continue  # Stopped while the image was running: it is neither a result nor a failure
+                if report_entry:
+                    (retried if output_image_path else failures).append(report_entry)
+            else:
+                output_image_path = process_single_image(image_name, output_folder)  # Processes the individual image
+            processed += 1
+            if result_callback:
+                result_callback(image_name, output_image_path)  # Reports the saved file (None if it failed)
 
         # Final status update
-        update_status_callback("Process completed." if running_flag() else "Process stopped.")
+        status = "Process completed." if running_flag() else "Process stopped."
+        if isolated:
+            downscaled = sum(1 for entry in retried if entry["downscaled"])
+            if failures or downscaled:
+                status = f"{status} {len(failures)} images failed, {downscaled} saved downscaled, see {FAILURE_REPORT_NAME}."
+        update_status_callback(status)
     except Exception as e:
+        error = f"{type(e).__name__}: {e}"
         update_status_callback(f"An error occurred: {e}")  # If an error occurs, update the status with the error message
     finally:
+        if worker:
+            worker.stop()  # Shuts down the worker process
+        # Step 5: Write the failure report, also when the run was aborted, so the failures collected so far are kept
+        if isolated and output_folder:
+            try:
+                write_failure_report(output_folder, zip_file_path, len(images), processed, failures, retried,
+                                     stopped=not running_flag(), error=error)
+            except Exception as e:
+                update_status_callback(f"Could not write {FAILURE_REPORT_NAME}: {e}")
         cleanup_temp_folder()  # Cleans up the temporary extracted folder
 
 # Function to process a single image (removes background and saves the processed image)
 def process_single_image(image_name, output_folder):
     try:
         image_path = os.path.join('temp_images', image_name)  # Full path to the image file in the temp folder
+        return remove_background(image_path, output_folder)  # Returns the path of the saved image
+    except Exception as e:
+        print(f"Error processing {image_name}: {e}")  # Print any errors encountered while processing the image
+        return None
+
+# Function to remove the background of an image file and save it, raising on errors
+def remove_background(image_path, output_folder, max_side=None, session=None):
+    if max_side:
+        img_data = downscale_image(image_path, max_side)  # Works on a smaller copy of the image
+    else:
         with open(image_path, 'rb') as image_file:
             img_data = image_file.read()  # Read the image data
 
-        output_image_data = remove(img_data)  # Remove the background from the image using rembg
-        output_image = Image.open(io.BytesIO(output_image_data))  # Open the processed image data as an image
+    output_image_data = remove(img_data, session=session)  # Remove the background from the image using rembg
+    output_image = Image.open(io.BytesIO(output_image_data))  # Open the processed image data as an image
 
-        # Set the output path for the processed image
-        output_image_path = os.path.join(output_folder, f"no_bg_{os.path.splitext(image_name)[0]}")
+    # Set the output path for the processed image
+    image_name = os.path.basename(image_path)
+    output_image_path = os.path.join(output_folder, f"no_bg_{os.path.splitext(image_name)[0]}")
 
-        # Check if the image has transparency (RGBA) and save accordingly
-        if output_image.mode in ('RGBA', 'LA') or ('transparency' in output_image.info):
-            output_image.save(f"{output_image_path}.png", "PNG")  # Save as PNG if transparency is present
-        else:
-            output_image.convert("RGB").save(f"{output_image_path}.jpg", "JPEG")  # Save as JPG if no transparency
+    # Check if the image has transparency (RGBA) and save accordingly
+    if output_image.mode in ('RGBA', 'LA') or ('transparency' in output_image.info):
+        output_image_path = f"{output_image_path}.png"
+        output_image.save(output_image_path, "PNG")  # Save as PNG if transparency is present
+    else:
+        output_image_path = f"{output_image_path}.jpg"
+        output_image.convert("RGB").save(output_image_path, "JPEG")  # Save as JPG if no transparency
 
-    except Exception as e:
-        print(f"Error processing {image_name}: {e}")  # Print any errors encountered while processing the image
+    return output_image_path  # Returns the path of the saved image
+
+# Function to load an image scaled down so its longest side is at most max_side, returned as PNG data
+def downscale_image(image_path, max_side):
+    with Image.open(image_path) as image:
+        image.draft('RGB', (max_side, max_side))  # Lets JPEG decode at reduced scale instead of full resolution
+        image.thumbnail((max_side, max_side))
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+# Function run inside an isolated worker process: removes backgrounds until it receives None
+def _isolated_worker(task_queue, result_queue):
+    session = new_session()  # Loads the model once per worker, downloading it if it is not cached yet
+    result_queue.put("ready")  # Tells the parent that image timeouts can start
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        image_path, output_folder, max_side = task
+        try:
+            result_queue.put((remove_background(image_path, output_folder, max_side, session), None))
+        except BaseException as e:
+            result_queue.put((None, f"{type(e).__name__}: {e}"))
+
+class WorkerStartError(RuntimeError):
+    """Raised when an isolated worker exits or times out while loading the model."""
+
+
+class IsolatedWorker:
+    """Runs remove_background in a child process that can be killed when an image hangs or crashes it."""
+
+    def __init__(self, recycle_after=WORKER_RECYCLE_AFTER):
+        self.context = multiprocessing.get_context('spawn')  # Forking a process that runs Qt threads is unsafe
+        self.recycle_after = recycle_after
+        self.process = None
+        self.processed = 0
+        self.start_failures = 0  # Consecutive failed starts
+
+    # Starts a worker and waits until its model is loaded; returns False if the user stopped the run meanwhile
+    def start(self, running_flag):
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.process = self.context.Process(target=_isolated_worker, args=(self.task_queue, self.result_queue), daemon=True)
+        self.process.start()
+        self.processed = 0
+
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while True:
+            try:
+                self.result_queue.get(timeout=0.5)  # The "ready" message
+                self.start_failures = 0
+                return True
+            except queue.Empty:
+                if not running_flag():
+                    self.stop(kill=True)
+                    return False
+                if not self.process.is_alive():
+                    exit_code = self.process.exitcode
+                    self.stop(kill=True)
+                    raise WorkerStartError(f"Worker failed to start (exit code {exit_code})")
+                if time.monotonic() > deadline:
+                    self.stop(kill=True)
+                    raise WorkerStartError(f"Worker did not load the model within {WORKER_START_TIMEOUT} seconds")
+
+    def stop(self, kill=False):
+        if self.process is None:
+            return
+        if not kill and self.process.is_alive():
+            self.task_queue.put(None)  # Asks the worker to exit once it is idle
+            self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        for worker_queue in (self.task_queue, self.result_queue):
+            worker_queue.cancel_join_thread()  # A killed worker may never drain its queue
+            worker_queue.close()
+        self.process = None
+
+    # Runs one attempt and returns (output_image_path, error, status)
+    # status is "ok", "error", "timed_out", "crashed", "worker_start_failed" or "stopped"
+    def run(self, image_path, output_folder, running_flag, timeout, max_side=None):
+        if self.process is None or self.processed >= self.recycle_after:
+            self.stop()
+            try:
+                if not self.start(running_flag):
+                    return None, None, "stopped"  # Stopped by the user while the worker was starting
+            except WorkerStartError as e:
+                self.start_failures += 1
+                if self.start_failures >= WORKER_START_FAILURES:
+                    raise  # Workers cannot start at all (e.g. the model cannot be loaded): the run is aborted
+                return None, str(e), "worker_start_failed"
+        self.task_queue.put((image_path, output_folder, max_side))
+        self.processed += 1
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                output_image_path, error = self.result_queue.get(timeout=0.5)
+                break
+            except queue.Empty:
+                if not running_flag():
+                    self.stop(kill=True)  # Stopped by the user: the image is abandoned
+                    return None, None, "stopped"
+                if not self.process.is_alive():
+                    exit_code = self.process.exitcode
+                    self.stop(kill=True)
+                    return None, f"Worker crashed (exit code {exit_code})", "crashed"
+                if time.monotonic() > deadline:
+                    self.stop(kill=True)
+                    return None, f"Timed out after {timeout} seconds", "timed_out"
+
+        if error:
+            # The exception was caught inside the worker, which is still usable; recycling bounds any leak
+            return None, error, "error"
+        return output_image_path, None, "ok"
+
+    # Processes an image with retries and returns (output_image_path, report_entry)
+    # report_entry is None if the first attempt succeeded, otherwise it describes the failed attempts
+    def process_image(self, image_path, output_folder, running_flag, timeout=IMAGE_TIMEOUT, retries=IMAGE_RETRIES, retry_max_side=RETRY_MAX_SIDE):
+        attempts = []
+        for attempt in range(retries + 1):
+            max_side = retry_max_side if attempt > 1 else None  # The first retry keeps the full resolution
+            output_image_path, error, status = self.run(image_path, output_folder, running_flag, timeout, max_side)
+            if status == "stopped":
+                return None, None
+            if output_image_path:
+                if not attempts:
+                    return output_image_path, None
+                report_entry = self.report_entry(image_path, attempts)
+                report_entry["downscaled"] = max_side is not None  # The saved file is smaller than the original
+                report_entry["max_side"] = max_side
+                return output_image_path, report_entry
+            attempts.append({"attempt": attempt + 1, "max_side": max_side, "status": status, "error": error})
+            print(f"Error processing {os.path.basename(image_path)} (attempt {attempt + 1}): {error}")
+
+        return None, self.report_entry(image_path, attempts)
+
+    # Summarizes the failed attempts of an image for the failure report
+    def report_entry(self, image_path, attempts):
+        # The first attempt holds the real cause, later ones may fail differently on the downscaled copy
+        return {
+            "image": os.path.basename(image_path),
+            "status": attempts[0]["status"],
+            "error": attempts[0]["error"],
+            "timed_out": any(a["status"] == "timed_out" for a in attempts),
+            "crashed": any(a["status"] == "crashed" for a in attempts),
+            "attempts": attempts,
+        }
+
+# Function to write the machine-readable report of the images that failed or were only saved after retries
+def write_failure_report(output_folder, zip_file_path, total_images, processed_images, failures, retried=(), stopped=False, error=None):
+    report = {
+        "zip_file": os.path.abspath(zip_file_path),
+        "stopped": stopped,  # True if the user stopped the run before every image was processed
+        "error": error,  # Why the run was aborted, None if it was not
+        "total_images": total_images,
+        "processed_images": processed_images,
+        "failed_images": len(failures),
+        "retried_images": len(retried),
+        "downscaled_images": sum(1 for entry in retried if entry["downscaled"]),
+        "failures": failures,
+        "retried": list(retried),
+    }
+    report_path = os.path.join(output_folder, FAILURE_REPORT_NAME)
+    with open(report_path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2)
+    return report_path
 
 # Cleanup function to remove the temporary folder after processing is complete
 def cleanup_temp_folder():
@@ -70,3 +305,39 @@ def cleanup_temp_folder():
         os.rmdir('temp_images')  # Remove the empty temp folder
     except Exception:
         pass  # If any error occurs during cleanup, simply pass (ignore the error)
+
+# Function to get a small thumbnail of an image, generating it only if it is not already cached on disk
+def create_thumbnail(image_path, thumbnail_dir=THUMBNAIL_DIR, size=THUMBNAIL_SIZE):
+    stat = os.stat(image_path)
+    # The cache key changes whenever the image is rewritten, so stale thumbnails are never shown
+    key = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+    thumbnail_path = os.path.join(thumbnail_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+    if os.path.exists(thumbnail_path):
+        try:
+            os.utime(thumbnail_path)  # Marks the thumbnail as recently used, so pruning keeps it
+            return thumbnail_path  # Cache hit: no decoding needed
+        except FileNotFoundError:
+            pass  # Pruned meanwhile: generate it again
+
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    with Image.open(image_path) as image:
+        image.draft('RGB', size)  # Lets JPEG decode at reduced scale instead of full resolution
+        image.thumbnail(size)  # Shrinks in place, keeping the aspect ratio
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        temp_path = f"{thumbnail_path}.{os.getpid()}.tmp"
+        image.save(temp_path, "PNG")
+    os.replace(temp_path, thumbnail_path)  # Atomic, so concurrent readers never see a partial file
+    return thumbnail_path
+
+# Function to keep the on-disk thumbnail cache bounded by removing the least recently used thumbnails
+def prune_thumbnail_cache(thumbnail_dir=THUMBNAIL_DIR, max_files=THUMBNAIL_CACHE_LIMIT):
+    try:
+        thumbnails = [os.path.join(thumbnail_dir, f) for f in os.listdir(thumbnail_dir) if f.endswith('.png')]
+        if len(thumbnails) <= max_files:
+            return
+        thumbnails.sort(key=os.path.getmtime)  # Least recently used first
+        for thumbnail_path in thumbnails[:len(thumbnails) - max_files]:
+            os.remove(thumbnail_path)
+    except Exception:
+        pass  # The cache is disposable, so errors while pruning are ignored
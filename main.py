@@ -1,11 +1,14 @@
 # main.py
 import sys
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from qfluentwidgets import setTheme, Theme
 from PyQt5.QtCore import Qt, QUrl
 from ui import Window
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Needed by the isolated workers when running as a frozen .exe
+
     QApplication.setHighDpiScaleFactorRoundingPolicy(Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
@@ -1,10 +1,14 @@
 # ui.py
-from PyQt5.QtCore import Qt, QUrl, pyqtSignal, QObject
-from PyQt5.QtGui import QIcon, QDesktopServices, QPixmap
-from PyQt5.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFileDialog, QMessageBox
+from PyQt5.QtCore import Qt, QUrl, pyqtSignal, QObject, QAbstractListModel, QModelIndex, QSize, QTimer, QRunnable, QThreadPool
+from PyQt5.QtGui import QIcon, QDesktopServices, QPixmap, QImage, QColor
+from PyQt5.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFileDialog, QMessageBox, QListView
 from qfluentwidgets import FluentWindow, SubtitleLabel, FluentIcon as FIF, NavigationItemPosition, setFont
 import threading
-from functions import process_images
+from collections import OrderedDict
+from functions import process_images, create_thumbnail, prune_thumbnail_cache, THUMBNAIL_SIZE
+
+UI_REFRESH_INTERVAL = 100  # Milliseconds between progress refreshes (10 per second, however fast images finish)
+PIXMAP_CACHE_LIMIT = 500  # Maximum number of thumbnails kept in memory by the results gallery
 
 #
 #
@@ -34,6 +38,123 @@ class Widget(QFrame):
         # Sets the object name of the widget to be the 'text' string with spaces replaced by dashes ('-'). This could be useful for identification, styling, or for referencing the widget programmatically in other parts of the code.
 
 
+class ThumbnailSignals(QObject):
+    loaded = pyqtSignal(int, str, QImage)  # Emitted with the request generation, the image path and its thumbnail (null if it could not be read)
+
+
+class ThumbnailLoader(QRunnable):
+    """Loads one thumbnail on a pool thread so large images never block the GUI."""
+
+    def __init__(self, generation, image_path, signals):
+        super().__init__()
+        self.generation = generation
+        self.image_path = image_path
+        self.signals = signals
+
+    def run(self):
+        image = QImage()
+        for _ in range(2):  # A second try regenerates a thumbnail pruned between creation and loading
+            try:
+                image = QImage(create_thumbnail(self.image_path))  # QImage (unlike QPixmap) is safe to build off the GUI thread
+            except Exception:
+                image = QImage()
+            if not image.isNull():
+                break
+        self.signals.loaded.emit(self.generation, self.image_path, image)
+
+
+class ResultsModel(QAbstractListModel):
+    """List model for the results gallery. Thumbnails are only requested for the rows the view paints."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.results = []  # (image_name, output_image_path) pairs, output_image_path is None for failed images
+        self.rows = {}  # Maps an output image path to its row
+        self.pixmaps = OrderedDict()  # Bounded in-memory thumbnail cache, least recently used first
+        self.pending = set()  # Paths whose thumbnail is being loaded
+        self.requests = 0  # Counter used as priority so the latest (visible) requests are served first
+        self.generation = 0  # Incremented by clear(), so thumbnails requested before it are ignored
+
+        self.threadPool = QThreadPool(self)
+        self.threadPool.setMaxThreadCount(2)  # Leaves the remaining cores to the background removal
+        self.signals = ThumbnailSignals()
+        self.signals.loaded.connect(self.thumbnail_loaded)
+
+        self.placeholderPixmap = QPixmap(*THUMBNAIL_SIZE)
+        self.placeholderPixmap.fill(QColor("#46555F"))
+        self.failedPixmap = QPixmap(*THUMBNAIL_SIZE)
+        self.failedPixmap.fill(QColor("#8b3a3a"))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.results)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        image_name, output_image_path = self.results[index.row()]
+
+        if role == Qt.DisplayRole:
+            return image_name
+        if role == Qt.ToolTipRole:
+            return output_image_path or f"Error processing {image_name}"
+        if role == Qt.DecorationRole:
+            if output_image_path is None:
+                return self.failedPixmap
+            pixmap = self.pixmaps.get(output_image_path)
+            if pixmap is not None:
+                self.pixmaps.move_to_end(output_image_path)
+                return pixmap
+            if output_image_path not in self.pending:
+                self.pending.add(output_image_path)
+                self.requests += 1
+                self.threadPool.start(ThumbnailLoader(self.generation, output_image_path, self.signals), self.requests)
+            return self.placeholderPixmap
+        return None
+
+    def add_results(self, results):
+        """Appends a batch of results with a single row insertion."""
+        if not results:
+            return
+        first = len(self.results)
+        self.beginInsertRows(QModelIndex(), first, first + len(results) - 1)
+        for image_name, output_image_path in results:
+            if output_image_path:
+                self.rows[output_image_path] = len(self.results)
+            self.results.append((image_name, output_image_path))
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.threadPool.clear()  # Drops thumbnail requests that have not started yet
+        self.generation += 1  # Loaders that are already running will be ignored when they finish
+        self.results = []
+        self.rows = {}
+        self.pixmaps.clear()
+        self.pending.clear()
+        self.endResetModel()
+
+    def thumbnail_loaded(self, generation, image_path, image):
+        if generation != self.generation:
+            return  # Requested before the gallery was cleared, possibly for a file that has since been rewritten
+        self.pending.discard(image_path)
+        row = self.rows.get(image_path)
+        if row is None:
+            return  # The gallery was cleared while the thumbnail was loading
+
+        if image.isNull():
+            return  # Not cached, so the thumbnail is requested again the next time the row is painted
+
+        self.pixmaps[image_path] = QPixmap.fromImage(image)
+        while len(self.pixmaps) > PIXMAP_CACHE_LIMIT:
+            self.pixmaps.popitem(last=False)  # Evicts the least recently shown thumbnail
+
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def output_path(self, index):
+        return self.results[index.row()][1]
+
+
 class HomeWidget(QFrame):
 
     def __init__(self, parent=None):
@@ -122,6 +243,18 @@ class RemoveBGWidget(QFrame):
         self.running = False
         self.zip_file_path = ""
         self.output_dir = ""
+        self.processingThread = None
+
+        # Progress reported by the processing thread, drained by the refresh timer
+        self.progressLock = threading.Lock()
+        self.pendingResults = []
+        self.pendingStatus = None
+        self.processingDone = False
+        self.processedCount = 0
+
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.setInterval(UI_REFRESH_INTERVAL)
+        self.refreshTimer.timeout.connect(self.flush_progress)
         self.initUI()
 
     def initUI(self):
@@ -225,6 +358,21 @@ class RemoveBGWidget(QFrame):
         """)
         self.layout.addLayout(self.controlsLayout)
 
+        # Results gallery (middle section)
+        self.resultsModel = ResultsModel(self)
+        self.resultsView = QListView(self)
+        self.resultsView.setViewMode(QListView.IconMode)
+        self.resultsView.setResizeMode(QListView.Adjust)
+        self.resultsView.setMovement(QListView.Static)
+        self.resultsView.setUniformItemSizes(True)  # Avoids measuring every item when laying out thousands of results
+        self.resultsView.setLayoutMode(QListView.Batched)
+        self.resultsView.setBatchSize(200)
+        self.resultsView.setIconSize(QSize(*THUMBNAIL_SIZE))
+        self.resultsView.setGridSize(QSize(THUMBNAIL_SIZE[0] + 32, THUMBNAIL_SIZE[1] + 32))
+        self.resultsView.setModel(self.resultsModel)
+        self.resultsView.doubleClicked.connect(self.open_result)  # Opens the processed image to inspect the mask
+        self.layout.addWidget(self.resultsView, 1)
+
         # Status and start/stop buttons (lower section)
         self.bottomLayout = QVBoxLayout()
         self.bottomLayout.setContentsMargins(10, 10, 10, 10)
@@ -272,20 +420,73 @@ class RemoveBGWidget(QFrame):
             self.startStopButton.setText("Start")
             self.statusLabel.setText("Process stopped.")
         else:
+            if self.processingThread and self.processingThread.is_alive():
+                self.statusLabel.setText("Waiting for the current image to finish...")
+                return
+
             self.running = True
             self.startStopButton.setText("Stop")
             self.statusLabel.setText("Processing...")
-            threading.Thread(target=self._start_processing).start()
+
+            self.resultsModel.clear()
+            self.pendingResults = []
+            self.pendingStatus = None
+            self.processingDone = False
+            self.processedCount = 0
+            self.refreshTimer.start()
+
+            self.processingThread = threading.Thread(target=self._start_processing)
+            self.processingThread.start()
 
     def _start_processing(self):
         """Calls the process_images function from functions.py."""
-        process_images(
-            zip_file_path=self.zip_file_path,
-            output_dir=self.output_dir,
-            update_status_callback=self.update_status.emit,  # Passes the callback for status updates
-            running_flag=lambda: self.running  # Passes the dynamic running flag
-        )
-        
+        try:
+            process_images(
+                zip_file_path=self.zip_file_path,
+                output_dir=self.output_dir,
+                update_status_callback=self.queue_status,  # Passes the callback for status updates
+                running_flag=lambda: self.running,  # Passes the dynamic running flag
+                result_callback=self.queue_result,  # Passes the callback for the gallery
+                isolated=True  # Runs each image in a worker that is killed if it hangs or crashes
+            )
+            prune_thumbnail_cache()  # Keeps the on-disk thumbnail cache bounded
+        finally:
+            with self.progressLock:
+                self.processingDone = True
+
+    def queue_status(self, message):
+        """Stores the latest status; called from the processing thread."""
+        with self.progressLock:
+            self.pendingStatus = message
+
+    def queue_result(self, image_name, output_image_path):
+        """Stores a processed image for the gallery; called from the processing thread."""
+        with self.progressLock:
+            self.pendingResults.append((image_name, output_image_path))
+
+    def flush_progress(self):
+        """Applies the progress queued since the last tick, so the UI refreshes at a fixed rate."""
+        with self.progressLock:
+            results, self.pendingResults = self.pendingResults, []
+            status, self.pendingStatus = self.pendingStatus, None
+            done = self.processingDone
+
+        self.resultsModel.add_results(results)
+        self.processedCount += len(results)
+        if status:
+            self.statusLabel.setText(f"{status} ({self.processedCount} images processed)")
+
+        if done:
+            self.refreshTimer.stop()
+            self.running = False
+            self.startStopButton.setText("Start")
+
+    def open_result(self, index):
+        """Opens a processed image with the default viewer."""
+        output_image_path = self.resultsModel.output_path(index)
+        if output_image_path:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(output_image_path))
+
     def select_zip(self):
         """Opens a dialog to select a ZIP file."""
         options = QFileDialog.Options()